@@ -1,9 +1,13 @@
+import io
 import os
+import csv
 import logging
+import time
+import zlib
+from collections import Counter
+from functools import lru_cache
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, make_response
-import pandas as pd
-from io import BytesIO
+from flask import Flask, Response, g, render_template, request, redirect, url_for, flash, jsonify, send_file
 from data_manager import DataManager
 
 # Configure logging
@@ -15,63 +19,167 @@ app = Flask(__name__)
 os.makedirs('data', exist_ok=True)
 app.secret_key = os.environ.get("SESSION_SECRET", "your-secret-key-here")
 
-# Initialize data manager
+# Initialize data manager and load the data files once, so that with
+# `gunicorn --preload` workers share the parsed data copy-on-write
 data_manager = DataManager()
+data_manager.prewarm()
+
+# Hours worked per roster period code (D=day, N=night, F=full 24h)
+SHIFT_HOURS = {'D': 12, 'N': 12, 'F': 24}
+
+def _url_for(endpoint):
+    """url_for() for argument-free endpoints, built once per endpoint and mount point"""
+    return _endpoint_url(endpoint, request.script_root)
+
+@lru_cache(maxsize=None)
+def _endpoint_url(endpoint, script_root):
+    return url_for(endpoint)
+
+def _record_id(ref, id_at):
+    """Resolve an edit/delete URL's record: its stable id with ?by=id, otherwise its row position"""
+    if request.args.get('by') == 'id':
+        return ref
+    return id_at(ref)
+
+def _cached(name, loader):
+    """Load a collection at most once per request"""
+    cache = g.setdefault('data_cache', {})
+    if name not in cache:
+        cache[name] = loader()
+    return cache[name]
+
+# CSV export columns: (record key, Arabic header)
+EMPLOYEE_EXPORT = [('code', 'رمز الموظف'), ('name', 'الاسم'), ('phone', 'رقم الهاتف'), ('role', 'الوظيفة')]
+AMBULANCE_EXPORT = [('plate', 'رقم اللوحة'), ('model', 'الطراز'), ('status', 'الحالة'),
+                    ('last_service', 'تاريخ آخر صيانة'), ('notes', 'ملاحظات')]
+SHIFT_EXPORT = [('date', 'التاريخ'), ('period', 'الفترة'), ('employee_code', 'رمز الموظف'),
+                ('sector', 'القطاع'), ('chief_name', 'اسم الرئيس')]
+TEAM_EXPORT = [('date', 'التاريخ'), ('morning_teams', 'فرق الصباح'), ('evening_teams', 'فرق المساء'),
+               ('full_teams', 'فرق 24 ساعة'), ('notes', 'ملاحظات')]
+TASK_EXPORT = [('employee_name', 'اسم الموظف'), ('task_description', 'وصف المهمة'),
+               ('supervisor_name', 'اسم المشرف'), ('created_at', 'تاريخ الإنشاء'),
+               ('updated_at', 'تاريخ التحديث')]
+
+class _Echo:
+    """File-like object whose write() returns the text, so csv.writer rows can be yielded"""
+    def write(self, value):
+        return value
+
+def _csv_response(filename, columns, records):
+    """Stream records as a CSV attachment (UTF-8 with BOM so Excel shows Arabic correctly)"""
+    def generate():
+        # Missing fields (e.g. updated_at on never-edited tasks) are written empty
+        writer = csv.DictWriter(_Echo(), fieldnames=[key for key, _ in columns], restval='',
+                                extrasaction='ignore', lineterminator='\n')
+        yield '\ufeff' + writer.writer.writerow([header for _, header in columns])
+        for record in records:
+            yield writer.writerow(record)
+    
+    gzipped = request.accept_encodings['gzip'] > 0
+    body = _gzip_stream(generate()) if gzipped else generate()
+    response = Response(body, content_type='text/csv; charset=utf-8')
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    response.vary.add('Accept-Encoding')
+    if gzipped:
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+@lru_cache(maxsize=None)
+def _pyarrow():
+    """Import pyarrow on first use (it is slow to load); None when it is not installed"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    return pa, pq
+
+def _parquet_response(filename, columns, records):
+    """Send records as a zstd-compressed Parquet attachment (requires pyarrow)"""
+    pa, pq = _pyarrow()
+    table = pa.table({header: pa.array([record.get(key, '') for record in records], type=pa.string())
+                      for key, header in columns})
+    buffer = io.BytesIO()
+    # Parquet dictionary-encodes repeated values (employee/supervisor names) by default
+    pq.write_table(table, buffer, compression='zstd')
+    buffer.seek(0)
+    return send_file(buffer, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=filename, max_age=0)
+
+def _gzip_stream(chunks):
+    """Gzip a stream of text chunks as it is produced (low level: the CSVs are repetitive)"""
+    compressor = zlib.compressobj(1, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+# Last computed dashboard statistics, reused while the data files are unchanged
+DASHBOARD_CACHE_TTL = 5  # seconds
+_dashboard_cache = {'key': None, 'time': 0.0, 'payload': None}
+
+def _dashboard_payload():
+    """Compute dashboard statistics, reusing the previous result for unchanged data"""
+    base_date = datetime.now().date()
+    today = base_date.isoformat()
+    key = (data_manager.last_modified(), today)
+    now = time.monotonic()
+    if _dashboard_cache['key'] == key and now - _dashboard_cache['time'] < DASHBOARD_CACHE_TTL:
+        return _dashboard_cache['payload']
+    
+    # Get summary statistics
+    data = data_manager.snapshot()
+    employees = data['employees']
+    ambulances = data['ambulances']
+    shifts = data['shifts']
+    teams = data['teams']
+    tasks = data['tasks']
+    
+    total_employees = len(employees)
+    total_ambulances = len(ambulances)
+    ready_ambulances = len([a for a in ambulances if a['status'] == 'جاهز'])
+    
+    # Get today's shifts and teams
+    today_shifts = [s for s in shifts if s['date'] == today]
+    today_teams = [t for t in teams if t['date'] == today]
+    
+    # Calculate total teams for today
+    teams_morning = teams_evening = teams_full = 0
+    for t in today_teams:
+        teams_morning += t['morning_teams']
+        teams_evening += t['evening_teams']
+        teams_full += t['full_teams']
+    total_teams_today = teams_morning + teams_evening + teams_full
+    
+    # Get active tasks count
+    active_tasks = len(tasks)
+    
+    # Get last 30 days shifts for chart
+    last_30_days = [(base_date - timedelta(days=30 - i)).isoformat() for i in range(30)]
+    shifts_per_day = Counter(s['date'] for s in shifts)
+    chart_data = [{'date': date_str, 'count': shifts_per_day[date_str]} for date_str in last_30_days]
+    
+    payload = {
+        'total_employees': total_employees,
+        'total_ambulances': total_ambulances,
+        'ready_ambulances': ready_ambulances,
+        'today_shifts': today_shifts,
+        'chart_data': chart_data,
+        'total_teams_today': total_teams_today,
+        'teams_morning': teams_morning,
+        'teams_evening': teams_evening,
+        'teams_full': teams_full,
+        'active_tasks': active_tasks
+    }
+    _dashboard_cache.update(key=key, time=now, payload=payload)
+    return payload
 
 @app.route('/')
 def dashboard():
     """Dashboard with summary statistics and today's shifts"""
     try:
-        # Get summary statistics
-        employees = data_manager.get_employees()
-        ambulances = data_manager.get_ambulances()
-        shifts = data_manager.get_shifts()
-        teams = data_manager.get_teams()
-        tasks = data_manager.get_tasks()
-        
-        total_employees = len(employees)
-        total_ambulances = len(ambulances)
-        ready_ambulances = len([a for a in ambulances if a['status'] == 'جاهز'])
-        
-        # Get today's shifts and teams
-        today = datetime.now().strftime('%Y-%m-%d')
-        today_shifts = [s for s in shifts if s['date'] == today]
-        today_teams = [t for t in teams if t['date'] == today]
-        
-        # Calculate total teams for today
-        teams_morning = sum(int(t.get('morning_teams', 0)) for t in today_teams)
-        teams_evening = sum(int(t.get('evening_teams', 0)) for t in today_teams)
-        teams_full = sum(int(t.get('full_teams', 0)) for t in today_teams)
-        total_teams_today = teams_morning + teams_evening + teams_full
-        
-        # Get active tasks count
-        active_tasks = len(tasks)
-        
-        # Get last 30 days shifts for chart
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30)
-        chart_data = []
-        
-        for i in range(30):
-            current_date = start_date + timedelta(days=i)
-            date_str = current_date.strftime('%Y-%m-%d')
-            day_shifts = len([s for s in shifts if s['date'] == date_str])
-            chart_data.append({
-                'date': current_date.strftime('%Y-%m-%d'),
-                'count': day_shifts
-            })
-        
-        return render_template('dashboard.html',
-                             total_employees=total_employees,
-                             total_ambulances=total_ambulances,
-                             ready_ambulances=ready_ambulances,
-                             today_shifts=today_shifts,
-                             chart_data=chart_data,
-                             total_teams_today=total_teams_today,
-                             teams_morning=teams_morning,
-                             teams_evening=teams_evening,
-                             teams_full=teams_full,
-                             active_tasks=active_tasks)
+        return render_template('dashboard.html', **_dashboard_payload())
     except Exception as e:
         logging.error(f"Dashboard error: {e}")
         flash('حدث خطأ في تحميل لوحة التحكم', 'error')
@@ -87,11 +195,28 @@ def dashboard():
                              teams_full=0,
                              active_tasks=0)
 
+@app.route('/api/dashboard.json')
+def dashboard_api():
+    """Dashboard statistics as JSON, with an ETag so unchanged data returns 304"""
+    try:
+        etag = f"{data_manager.last_modified():x}-{datetime.now().date().isoformat()}"
+        if etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        
+        response = jsonify(_dashboard_payload())
+        response.set_etag(etag)
+        return response
+    except Exception as e:
+        logging.exception("Dashboard API error")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 @app.route('/employees')
 def employees():
     """Employee management page"""
     try:
-        employees_data = data_manager.get_employees()
+        employees_data = _cached('employees', data_manager.get_employees)
         return render_template('employees.html', employees=employees_data)
     except Exception as e:
         logging.error(f"Employees page error: {e}")
@@ -109,13 +234,7 @@ def add_employee():
         
         if not all([code, name, phone, role]):
             flash('جميع الحقول مطلوبة', 'error')
-            return redirect(url_for('employees'))
-        
-        # Check if employee code already exists
-        employees = data_manager.get_employees()
-        if any(emp['code'] == code for emp in employees):
-            flash('رمز الموظف موجود مسبقاً', 'error')
-            return redirect(url_for('employees'))
+            return redirect(_url_for('employees'))
         
         employee = {
             'code': code,
@@ -124,14 +243,20 @@ def add_employee():
             'role': role
         }
         
-        data_manager.add_employee(employee)
+        # Check and insert under one write lock so two workers cannot both add the same code
+        with data_manager.batch():
+            if data_manager.contains_employee(code):
+                flash('رمز الموظف موجود مسبقاً', 'error')
+                return redirect(_url_for('employees'))
+            
+            data_manager.add_employee(employee)
         flash('تم إضافة الموظف بنجاح', 'success')
         
     except Exception as e:
         logging.error(f"Add employee error: {e}")
         flash('حدث خطأ في إضافة الموظف', 'error')
     
-    return redirect(url_for('employees'))
+    return redirect(_url_for('employees'))
 
 @app.route('/employees/edit/<code>', methods=['POST'])
 def edit_employee(code):
@@ -143,7 +268,7 @@ def edit_employee(code):
         
         if not all([name, phone, role]):
             flash('جميع الحقول مطلوبة', 'error')
-            return redirect(url_for('employees'))
+            return redirect(_url_for('employees'))
         
         employee = {
             'code': code,
@@ -159,7 +284,7 @@ def edit_employee(code):
         logging.error(f"Edit employee error: {e}")
         flash('حدث خطأ في تحديث بيانات الموظف', 'error')
     
-    return redirect(url_for('employees'))
+    return redirect(_url_for('employees'))
 
 @app.route('/employees/delete/<code>', methods=['POST'])
 def delete_employee(code):
@@ -171,42 +296,31 @@ def delete_employee(code):
         logging.error(f"Delete employee error: {e}")
         flash('حدث خطأ في حذف الموظف', 'error')
     
-    return redirect(url_for('employees'))
+    return redirect(_url_for('employees'))
 
 @app.route('/employees/export')
 def export_employees():
     """Export employees to CSV"""
     try:
-        employees = data_manager.get_employees()
-        df = pd.DataFrame(employees)
+        employees = _cached('employees', data_manager.get_employees)
         
-        if df.empty:
+        if not employees:
             flash('لا توجد بيانات للتصدير', 'warning')
-            return redirect(url_for('employees'))
-        
-        # Rename columns to Arabic
-        df.columns = ['رمز الموظف', 'الاسم', 'رقم الهاتف', 'الوظيفة']
-        
-        output = BytesIO()
-        df.to_csv(output, index=False, encoding='utf-8-sig')
-        output.seek(0)
+            return redirect(_url_for('employees'))
         
-        response = make_response(output.getvalue())
-        response.headers["Content-Disposition"] = f"attachment; filename=employees_{datetime.now().strftime('%Y%m%d')}.csv"
-        response.headers["Content-type"] = "text/csv; charset=utf-8"
-        
-        return response
+        filename = f"employees_{datetime.now().strftime('%Y%m%d')}.csv"
+        return _csv_response(filename, EMPLOYEE_EXPORT, employees)
         
     except Exception as e:
         logging.error(f"Export employees error: {e}")
         flash('حدث خطأ في تصدير البيانات', 'error')
-        return redirect(url_for('employees'))
+        return redirect(_url_for('employees'))
 
 @app.route('/ambulances')
 def ambulances():
     """Ambulance management page"""
     try:
-        ambulances_data = data_manager.get_ambulances()
+        ambulances_data = _cached('ambulances', data_manager.get_ambulances)
         return render_template('ambulances.html', ambulances=ambulances_data)
     except Exception as e:
         logging.error(f"Ambulances page error: {e}")
@@ -225,13 +339,7 @@ def add_ambulance():
         
         if not all([plate, model, status]):
             flash('الحقول المطلوبة: رقم اللوحة، الطراز، الحالة', 'error')
-            return redirect(url_for('ambulances'))
-        
-        # Check if plate number already exists
-        ambulances = data_manager.get_ambulances()
-        if any(amb['plate'] == plate for amb in ambulances):
-            flash('رقم اللوحة موجود مسبقاً', 'error')
-            return redirect(url_for('ambulances'))
+            return redirect(_url_for('ambulances'))
         
         ambulance = {
             'plate': plate,
@@ -241,14 +349,20 @@ def add_ambulance():
             'notes': notes
         }
         
-        data_manager.add_ambulance(ambulance)
+        # Check and insert under one write lock so two workers cannot both add the same plate
+        with data_manager.batch():
+            if data_manager.contains_ambulance(plate):
+                flash('رقم اللوحة موجود مسبقاً', 'error')
+                return redirect(_url_for('ambulances'))
+            
+            data_manager.add_ambulance(ambulance)
         flash('تم إضافة سيارة الإسعاف بنجاح', 'success')
         
     except Exception as e:
         logging.error(f"Add ambulance error: {e}")
         flash('حدث خطأ في إضافة سيارة الإسعاف', 'error')
     
-    return redirect(url_for('ambulances'))
+    return redirect(_url_for('ambulances'))
 
 @app.route('/ambulances/edit/<plate>', methods=['POST'])
 def edit_ambulance(plate):
@@ -261,7 +375,7 @@ def edit_ambulance(plate):
         
         if not all([model, status]):
             flash('الحقول المطلوبة: الطراز، الحالة', 'error')
-            return redirect(url_for('ambulances'))
+            return redirect(_url_for('ambulances'))
         
         ambulance = {
             'plate': plate,
@@ -278,7 +392,7 @@ def edit_ambulance(plate):
         logging.error(f"Edit ambulance error: {e}")
         flash('حدث خطأ في تحديث بيانات سيارة الإسعاف', 'error')
     
-    return redirect(url_for('ambulances'))
+    return redirect(_url_for('ambulances'))
 
 @app.route('/ambulances/delete/<plate>', methods=['POST'])
 def delete_ambulance(plate):
@@ -290,43 +404,32 @@ def delete_ambulance(plate):
         logging.error(f"Delete ambulance error: {e}")
         flash('حدث خطأ في حذف سيارة الإسعاف', 'error')
     
-    return redirect(url_for('ambulances'))
+    return redirect(_url_for('ambulances'))
 
 @app.route('/ambulances/export')
 def export_ambulances():
     """Export ambulances to CSV"""
     try:
-        ambulances = data_manager.get_ambulances()
-        df = pd.DataFrame(ambulances)
+        ambulances = _cached('ambulances', data_manager.get_ambulances)
         
-        if df.empty:
+        if not ambulances:
             flash('لا توجد بيانات للتصدير', 'warning')
-            return redirect(url_for('ambulances'))
-        
-        # Rename columns to Arabic
-        df.columns = ['رقم اللوحة', 'الطراز', 'الحالة', 'تاريخ آخر صيانة', 'ملاحظات']
-        
-        output = BytesIO()
-        df.to_csv(output, index=False, encoding='utf-8-sig')
-        output.seek(0)
+            return redirect(_url_for('ambulances'))
         
-        response = make_response(output.getvalue())
-        response.headers["Content-Disposition"] = f"attachment; filename=ambulances_{datetime.now().strftime('%Y%m%d')}.csv"
-        response.headers["Content-type"] = "text/csv; charset=utf-8"
-        
-        return response
+        filename = f"ambulances_{datetime.now().strftime('%Y%m%d')}.csv"
+        return _csv_response(filename, AMBULANCE_EXPORT, ambulances)
         
     except Exception as e:
         logging.error(f"Export ambulances error: {e}")
         flash('حدث خطأ في تصدير البيانات', 'error')
-        return redirect(url_for('ambulances'))
+        return redirect(_url_for('ambulances'))
 
 @app.route('/shifts')
 def shifts():
     """Shift management page"""
     try:
-        shifts_data = data_manager.get_shifts()
-        employees = data_manager.get_employees()
+        shifts_data = _cached('shifts', data_manager.get_shifts)
+        employees = _cached('employees', data_manager.get_employees)
         
         # Filter by month if specified
         month_filter = request.args.get('month', '')
@@ -351,13 +454,12 @@ def add_shift():
         
         if not all([date, period, employee_code, sector]):
             flash('الحقول المطلوبة: التاريخ، الفترة، رمز الموظف، القطاع', 'error')
-            return redirect(url_for('shifts'))
+            return redirect(_url_for('shifts'))
         
         # Validate employee exists
-        employees = data_manager.get_employees()
-        if not any(emp['code'] == employee_code for emp in employees):
+        if not data_manager.contains_employee(employee_code):
             flash('رمز الموظف غير موجود', 'error')
-            return redirect(url_for('shifts'))
+            return redirect(_url_for('shifts'))
         
         shift = {
             'date': date,
@@ -374,7 +476,7 @@ def add_shift():
         logging.error(f"Add shift error: {e}")
         flash('حدث خطأ في إضافة الوردية', 'error')
     
-    return redirect(url_for('shifts'))
+    return redirect(_url_for('shifts'))
 
 @app.route('/shifts/edit/<int:shift_id>', methods=['POST'])
 def edit_shift(shift_id):
@@ -388,13 +490,12 @@ def edit_shift(shift_id):
         
         if not all([date, period, employee_code, sector]):
             flash('الحقول المطلوبة: التاريخ، الفترة، رمز الموظف، القطاع', 'error')
-            return redirect(url_for('shifts'))
+            return redirect(_url_for('shifts'))
         
         # Validate employee exists
-        employees = data_manager.get_employees()
-        if not any(emp['code'] == employee_code for emp in employees):
+        if not data_manager.contains_employee(employee_code):
             flash('رمز الموظف غير موجود', 'error')
-            return redirect(url_for('shifts'))
+            return redirect(_url_for('shifts'))
         
         shift = {
             'date': date,
@@ -404,62 +505,65 @@ def edit_shift(shift_id):
             'chief_name': chief_name
         }
         
-        data_manager.update_shift(shift_id, shift)
-        flash('تم تحديث الوردية بنجاح', 'success')
+        # Row position links (as the shifts template builds them) still act on whatever row is there now;
+        # ?by=id links name the record itself
+        with data_manager.batch():
+            record_id = _record_id(shift_id, data_manager.shift_id_at)
+            found = record_id is not None and data_manager.update_shift(record_id, shift)
+        
+        if found:
+            flash('تم تحديث الوردية بنجاح', 'success')
+        else:
+            flash('الوردية غير موجودة', 'error')
         
     except Exception as e:
         logging.error(f"Edit shift error: {e}")
         flash('حدث خطأ في تحديث الوردية', 'error')
     
-    return redirect(url_for('shifts'))
+    return redirect(_url_for('shifts'))
 
 @app.route('/shifts/delete/<int:shift_id>', methods=['POST'])
 def delete_shift(shift_id):
     """Delete shift"""
     try:
-        data_manager.delete_shift(shift_id)
-        flash('تم حذف الوردية بنجاح', 'success')
+        # Row position links (as the shifts template builds them) still act on whatever row is there now;
+        # ?by=id links name the record itself
+        with data_manager.batch():
+            record_id = _record_id(shift_id, data_manager.shift_id_at)
+            found = record_id is not None and data_manager.delete_shift(record_id)
+        
+        if found:
+            flash('تم حذف الوردية بنجاح', 'success')
+        else:
+            flash('الوردية غير موجودة', 'error')
     except Exception as e:
         logging.error(f"Delete shift error: {e}")
         flash('حدث خطأ في حذف الوردية', 'error')
     
-    return redirect(url_for('shifts'))
+    return redirect(_url_for('shifts'))
 
 @app.route('/shifts/export')
 def export_shifts():
     """Export shifts to CSV"""
     try:
-        shifts = data_manager.get_shifts()
+        shifts = _cached('shifts', data_manager.get_shifts)
         
         # Filter by month if specified
         month_filter = request.args.get('month', '')
         if month_filter:
             shifts = [s for s in shifts if s['date'].startswith(month_filter)]
         
-        df = pd.DataFrame(shifts)
-        
-        if df.empty:
+        if not shifts:
             flash('لا توجد بيانات للتصدير', 'warning')
-            return redirect(url_for('shifts'))
-        
-        # Rename columns to Arabic
-        df.columns = ['التاريخ', 'الفترة', 'رمز الموظف', 'القطاع', 'اسم الرئيس']
-        
-        output = BytesIO()
-        df.to_csv(output, index=False, encoding='utf-8-sig')
-        output.seek(0)
+            return redirect(_url_for('shifts'))
         
-        response = make_response(output.getvalue())
         filename = f"shifts_{month_filter}_{datetime.now().strftime('%Y%m%d')}.csv" if month_filter else f"shifts_{datetime.now().strftime('%Y%m%d')}.csv"
-        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
-        response.headers["Content-type"] = "text/csv; charset=utf-8"
-        
-        return response
+        return _csv_response(filename, SHIFT_EXPORT, shifts)
         
     except Exception as e:
         logging.error(f"Export shifts error: {e}")
         flash('حدث خطأ في تصدير البيانات', 'error')
-        return redirect(url_for('shifts'))
+        return redirect(_url_for('shifts'))
 
 @app.route('/roster')
 def roster():
@@ -467,11 +571,10 @@ def roster():
     try:
         # Get current month or specified month
         month = request.args.get('month', datetime.now().strftime('%Y-%m'))
-        employees = data_manager.get_employees()
-        shifts = data_manager.get_shifts()
+        employees = _cached('employees', data_manager.get_employees)
         
-        # Filter shifts for the specified month
-        month_shifts = [s for s in shifts if s['date'].startswith(month)]
+        # Shifts for the specified month
+        month_shifts = data_manager.get_shifts_for_month(month)
         
         # Generate days for the month
         year, month_num = month.split('-')
@@ -482,15 +585,14 @@ def roster():
         days = [f"{year:04d}-{month_num:02d}-{day:02d}" for day in range(1, days_in_month + 1)]
         
         # Create roster data structure
+        days_template = dict.fromkeys(days, '')
         roster_data = {}
         for emp in employees:
             roster_data[emp['code']] = {
                 'name': emp['name'],
-                'shifts': {},
+                'shifts': days_template.copy(),
                 'total_hours': 0
             }
-            for day in days:
-                roster_data[emp['code']]['shifts'][day] = ''
         
         # Fill in shifts
         for shift in month_shifts:
@@ -498,12 +600,10 @@ def roster():
             date = shift['date']
             period = shift['period']
             
-            if emp_code in roster_data and date in roster_data[emp_code]['shifts']:
-                roster_data[emp_code]['shifts'][date] = period
-                
-                # Calculate hours (D=12, N=12, F=24)
-                hours = {'D': 12, 'N': 12, 'F': 24}.get(period, 0)
-                roster_data[emp_code]['total_hours'] += hours
+            row = roster_data.get(emp_code)
+            if row is not None and date in row['shifts']:
+                row['shifts'][date] = period
+                row['total_hours'] += SHIFT_HOURS.get(period, 0)
         
         return render_template('roster.html', 
                              roster_data=roster_data, 
@@ -532,31 +632,28 @@ def update_roster():
             flash('بيانات غير مكتملة', 'error')
             return redirect(url_for('roster', month=month))
         
-        # Remove existing shift for this employee on this date
-        shifts = data_manager.get_shifts()
-        existing_shift_id = None
-        for i, shift in enumerate(shifts):
-            if shift['employee_code'] == employee_code and shift['date'] == date:
-                existing_shift_id = i
-                break
-        
-        if period and period != 'O':  # If not off day
-            shift_data = {
-                'date': date,
-                'period': period,
-                'employee_code': employee_code,
-                'sector': 'عام',  # Default sector
-                'chief_name': ''
-            }
+        # Look up and change the shift under one write lock so concurrent updates cannot both add one
+        with data_manager.batch():
+            # Remove existing shift for this employee on this date
+            existing_shift_id = data_manager.find_shift(employee_code, date)
             
-            if existing_shift_id is not None:
-                data_manager.update_shift(existing_shift_id, shift_data)
+            if period and period != 'O':  # If not off day
+                shift_data = {
+                    'date': date,
+                    'period': period,
+                    'employee_code': employee_code,
+                    'sector': 'عام',  # Default sector
+                    'chief_name': ''
+                }
+                
+                if existing_shift_id is not None:
+                    data_manager.update_shift(existing_shift_id, shift_data)
+                else:
+                    data_manager.add_shift(shift_data)
             else:
-                data_manager.add_shift(shift_data)
-        else:
-            # Remove shift if setting to off or empty
-            if existing_shift_id is not None:
-                data_manager.delete_shift(existing_shift_id)
+                # Remove shift if setting to off or empty
+                if existing_shift_id is not None:
+                    data_manager.delete_shift(existing_shift_id)
         
         flash('تم تحديث الجدول بنجاح', 'success')
         
@@ -570,7 +667,7 @@ def update_roster():
 def teams():
     """Teams preparation page"""
     try:
-        teams_data = data_manager.get_teams()
+        teams_data = _cached('teams', data_manager.get_teams)
         # Filter by date if specified
         date_filter = request.args.get('date', '')
         if date_filter:
@@ -594,38 +691,38 @@ def add_team():
         
         if not date:
             flash('التاريخ مطلوب', 'error')
-            return redirect(url_for('teams'))
-        
-        # Check if entry for this date already exists
-        teams = data_manager.get_teams()
-        existing_team_id = None
-        for i, team in enumerate(teams):
-            if team['date'] == date:
-                existing_team_id = i
-                break
+            return redirect(_url_for('teams'))
         
         team_data = {
             'date': date,
-            'morning_teams': morning_teams or '0',
-            'evening_teams': evening_teams or '0',
-            'full_teams': full_teams or '0',
+            'morning_teams': int(morning_teams or 0),
+            'evening_teams': int(evening_teams or 0),
+            'full_teams': int(full_teams or 0),
             'notes': notes
         }
         
+        # Check and write under one write lock so two workers cannot both add a row for the date
+        with data_manager.batch():
+            # Check if entry for this date already exists
+            existing_team_id = data_manager.find_team(date)
+            
+            if existing_team_id is not None:
+                # Update existing entry
+                data_manager.update_team(existing_team_id, team_data)
+            else:
+                # Add new entry
+                data_manager.add_team(team_data)
+        
         if existing_team_id is not None:
-            # Update existing entry
-            data_manager.update_team(existing_team_id, team_data)
             flash('تم تحديث بيانات الفرق بنجاح', 'success')
         else:
-            # Add new entry
-            data_manager.add_team(team_data)
             flash('تم إضافة بيانات الفرق بنجاح', 'success')
         
     except Exception as e:
         logging.error(f"Add team error: {e}")
         flash('حدث خطأ في إضافة بيانات الفرق', 'error')
     
-    return redirect(url_for('teams'))
+    return redirect(_url_for('teams'))
 
 @app.route('/teams/edit/<int:team_id>', methods=['POST'])
 def edit_team(team_id):
@@ -639,88 +736,86 @@ def edit_team(team_id):
         
         if not date:
             flash('التاريخ مطلوب', 'error')
-            return redirect(url_for('teams'))
+            return redirect(_url_for('teams'))
         
         team_data = {
             'date': date,
-            'morning_teams': morning_teams or '0',
-            'evening_teams': evening_teams or '0',
-            'full_teams': full_teams or '0',
+            'morning_teams': int(morning_teams or 0),
+            'evening_teams': int(evening_teams or 0),
+            'full_teams': int(full_teams or 0),
             'notes': notes
         }
         
-        data_manager.update_team(team_id, team_data)
-        flash('تم تحديث بيانات الفرق بنجاح', 'success')
+        # Row position links (as the teams template builds them) still act on whatever row is there now;
+        # ?by=id links name the record itself
+        with data_manager.batch():
+            record_id = _record_id(team_id, data_manager.team_id_at)
+            found = record_id is not None and data_manager.update_team(record_id, team_data)
+        
+        if found:
+            flash('تم تحديث بيانات الفرق بنجاح', 'success')
+        else:
+            flash('بيانات الفرق غير موجودة', 'error')
         
     except Exception as e:
         logging.error(f"Edit team error: {e}")
         flash('حدث خطأ في تحديث بيانات الفرق', 'error')
     
-    return redirect(url_for('teams'))
+    return redirect(_url_for('teams'))
 
 @app.route('/teams/delete/<int:team_id>', methods=['POST'])
 def delete_team(team_id):
     """Delete team preparation"""
     try:
-        data_manager.delete_team(team_id)
-        flash('تم حذف بيانات الفرق بنجاح', 'success')
+        # Row position links (as the teams template builds them) still act on whatever row is there now;
+        # ?by=id links name the record itself
+        with data_manager.batch():
+            record_id = _record_id(team_id, data_manager.team_id_at)
+            found = record_id is not None and data_manager.delete_team(record_id)
+        
+        if found:
+            flash('تم حذف بيانات الفرق بنجاح', 'success')
+        else:
+            flash('بيانات الفرق غير موجودة', 'error')
     except Exception as e:
         logging.error(f"Delete team error: {e}")
         flash('حدث خطأ في حذف بيانات الفرق', 'error')
     
-    return redirect(url_for('teams'))
+    return redirect(_url_for('teams'))
 
 @app.route('/teams/export')
 def export_teams():
     """Export teams to CSV"""
     try:
-        teams = data_manager.get_teams()
+        teams = _cached('teams', data_manager.get_teams)
         
         # Filter by date if specified
         date_filter = request.args.get('date', '')
         if date_filter:
             teams = [t for t in teams if t['date'] == date_filter]
         
-        df = pd.DataFrame(teams)
-        
-        if df.empty:
+        if not teams:
             flash('لا توجد بيانات للتصدير', 'warning')
-            return redirect(url_for('teams'))
-        
-        # Rename columns to Arabic
-        df.columns = ['التاريخ', 'فرق الصباح', 'فرق المساء', 'فرق 24 ساعة', 'ملاحظات']
-        
-        output = BytesIO()
-        df.to_csv(output, index=False, encoding='utf-8-sig')
-        output.seek(0)
+            return redirect(_url_for('teams'))
         
-        response = make_response(output.getvalue())
         filename = f"teams_{date_filter}_{datetime.now().strftime('%Y%m%d')}.csv" if date_filter else f"teams_{datetime.now().strftime('%Y%m%d')}.csv"
-        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
-        response.headers["Content-type"] = "text/csv; charset=utf-8"
-        
-        return response
+        return _csv_response(filename, TEAM_EXPORT, teams)
         
     except Exception as e:
         logging.error(f"Export teams error: {e}")
         flash('حدث خطأ في تصدير البيانات', 'error')
-        return redirect(url_for('teams'))
+        return redirect(_url_for('teams'))
 
 @app.route('/tasks')
 def tasks():
     """Logistics support tasks page"""
     try:
-        tasks_data = data_manager.get_tasks()
-        employees = data_manager.get_employees()
+        employees = _cached('employees', data_manager.get_employees)
         
         # Filter by employee or supervisor if specified
         employee_filter = request.args.get('employee', '')
         supervisor_filter = request.args.get('supervisor', '')
-        
-        if employee_filter:
-            tasks_data = [t for t in tasks_data if employee_filter.lower() in t.get('employee_name', '').lower()]
-        if supervisor_filter:
-            tasks_data = [t for t in tasks_data if supervisor_filter.lower() in t.get('supervisor_name', '').lower()]
+        tasks_data = data_manager.search_tasks(employee_filter, supervisor_filter)
         
         return render_template('tasks.html', 
                              tasks=tasks_data, 
@@ -742,7 +837,7 @@ def add_task():
         
         if not all([employee_name, task_description, supervisor_name]):
             flash('جميع الحقول مطلوبة', 'error')
-            return redirect(url_for('tasks'))
+            return redirect(_url_for('tasks'))
         
         task_data = {
             'employee_name': employee_name,
@@ -758,7 +853,7 @@ def add_task():
         logging.error(f"Add task error: {e}")
         flash('حدث خطأ في إضافة المهمة', 'error')
     
-    return redirect(url_for('tasks'))
+    return redirect(_url_for('tasks'))
 
 @app.route('/tasks/edit/<int:task_id>', methods=['POST'])
 def edit_task(task_id):
@@ -770,22 +865,26 @@ def edit_task(task_id):
         
         if not all([employee_name, task_description, supervisor_name]):
             flash('جميع الحقول مطلوبة', 'error')
-            return redirect(url_for('tasks'))
+            return redirect(_url_for('tasks'))
+        
+        # Row position links (as the tasks template builds them) still act on whatever row is there now;
+        # ?by=id links name the record itself
+        with data_manager.batch():
+            record_id = _record_id(task_id, data_manager.task_id_at)
+            # Get original task to preserve created_at
+            original_task = None if record_id is None else data_manager.get_task(record_id)
+            if original_task is not None:
+                task_data = {
+                    'employee_name': employee_name,
+                    'task_description': task_description,
+                    'supervisor_name': supervisor_name,
+                    'created_at': original_task.get('created_at', datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+                    'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                }
+                
+                data_manager.update_task(record_id, task_data)
         
-        # Get original task to preserve created_at
-        tasks = data_manager.get_tasks()
-        if task_id < len(tasks):
-            original_task = tasks[task_id]
-            
-            task_data = {
-                'employee_name': employee_name,
-                'task_description': task_description,
-                'supervisor_name': supervisor_name,
-                'created_at': original_task.get('created_at', datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
-                'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            data_manager.update_task(task_id, task_data)
+        if original_task is not None:
             flash('تم تحديث المهمة بنجاح', 'success')
         else:
             flash('المهمة غير موجودة', 'error')
@@ -794,89 +893,68 @@ def edit_task(task_id):
         logging.error(f"Edit task error: {e}")
         flash('حدث خطأ في تحديث المهمة', 'error')
     
-    return redirect(url_for('tasks'))
+    return redirect(_url_for('tasks'))
 
 @app.route('/tasks/delete/<int:task_id>', methods=['POST'])
 def delete_task(task_id):
     """Delete task"""
     try:
-        data_manager.delete_task(task_id)
-        flash('تم حذف المهمة بنجاح', 'success')
+        # Row position links (as the tasks template builds them) still act on whatever row is there now;
+        # ?by=id links name the record itself
+        with data_manager.batch():
+            record_id = _record_id(task_id, data_manager.task_id_at)
+            found = record_id is not None and data_manager.delete_task(record_id)
+        
+        if found:
+            flash('تم حذف المهمة بنجاح', 'success')
+        else:
+            flash('المهمة غير موجودة', 'error')
     except Exception as e:
         logging.error(f"Delete task error: {e}")
         flash('حدث خطأ في حذف المهمة', 'error')
     
-    return redirect(url_for('tasks'))
+    return redirect(_url_for('tasks'))
 
 @app.route('/tasks/export')
 def export_tasks():
-    """Export tasks to CSV"""
+    """Export tasks to CSV (or Parquet with ?format=parquet)"""
     try:
-        tasks = data_manager.get_tasks()
+        export_format = request.args.get('format', 'csv')
+        if export_format == 'parquet' and _pyarrow() is None:
+            flash('تصدير Parquet غير متاح على هذا الخادم', 'error')
+            return redirect(_url_for('tasks'))
         
         # Filter by employee or supervisor if specified
         employee_filter = request.args.get('employee', '')
         supervisor_filter = request.args.get('supervisor', '')
+        tasks = data_manager.search_tasks(employee_filter, supervisor_filter)
         
-        if employee_filter:
-            tasks = [t for t in tasks if employee_filter.lower() in t.get('employee_name', '').lower()]
-        if supervisor_filter:
-            tasks = [t for t in tasks if supervisor_filter.lower() in t.get('supervisor_name', '').lower()]
-        
-        df = pd.DataFrame(tasks)
-        
-        if df.empty:
+        if not tasks:
             flash('لا توجد بيانات للتصدير', 'warning')
-            return redirect(url_for('tasks'))
-        
-        # Rename columns to Arabic
-        column_mapping = {
-            'employee_name': 'اسم الموظف',
-            'task_description': 'وصف المهمة',
-            'supervisor_name': 'اسم المشرف',
-            'created_at': 'تاريخ الإنشاء',
-            'updated_at': 'تاريخ التحديث'
-        }
-        df = df.rename(columns=column_mapping)
+            return redirect(_url_for('tasks'))
         
-        output = BytesIO()
-        df.to_csv(output, index=False, encoding='utf-8-sig')
-        output.seek(0)
+        filename = (f"tasks{f'_employee_{employee_filter}' if employee_filter else ''}"
+                    f"{f'_supervisor_{supervisor_filter}' if supervisor_filter else ''}"
+                    f"_{datetime.now():%Y%m%d}")
         
-        response = make_response(output.getvalue())
-        filters = []
-        if employee_filter:
-            filters.append(f"employee_{employee_filter}")
-        if supervisor_filter:
-            filters.append(f"supervisor_{supervisor_filter}")
-        
-        filename_parts = ["tasks"]
-        if filters:
-            filename_parts.extend(filters)
-        filename_parts.append(datetime.now().strftime('%Y%m%d'))
-        filename = "_".join(filename_parts) + ".csv"
-        
-        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
-        response.headers["Content-type"] = "text/csv; charset=utf-8"
-        
-        return response
+        if export_format == 'parquet':
+            return _parquet_response(f"{filename}.parquet", TASK_EXPORT, tasks)
+        return _csv_response(f"{filename}.csv", TASK_EXPORT, tasks)
         
     except Exception as e:
         logging.error(f"Export tasks error: {e}")
         flash('حدث خطأ في تصدير البيانات', 'error')
-        return redirect(url_for('tasks'))
+        return redirect(_url_for('tasks'))
 
 
 @app.route('/health')
 def health():
     try:
         # simple check: return counts length of current datasets
-        employees = data_manager.get_employees()
-        ambulances = data_manager.get_ambulances()
         return jsonify({
             "status": "ok",
-            "employees": len(employees),
-            "ambulances": len(ambulances)
+            "employees": data_manager.count_employees(),
+            "ambulances": data_manager.count_ambulances()
         }), 200
     except Exception as e:
         logging.exception("Health check failed")
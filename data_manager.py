@@ -1,7 +1,59 @@
+import gzip
 import json
 import os
 import logging
-from typing import List, Dict, Any
+import mmap
+import functools
+import sys
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Tuple, Callable, Hashable, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Files at least this large are memory-mapped rather than read when orjson is available
+MMAP_THRESHOLD = 1024 * 1024
+
+# Gzip data files on save (DATA_COMPRESS=1); compressed files are detected on load either way
+COMPRESS_DATA = os.environ.get('DATA_COMPRESS', '').lower() in ('1', 'true', 'yes')
+GZIP_MAGIC = b'\x1f\x8b'
+
+def _loads(raw: bytes) -> Any:
+    """Parse JSON, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def _dumps(data: Any, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON (compact unless indent is set), using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else None)
+    if indent:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def _first_positions(records: List[Dict[Any, Any]], key: Callable[[Dict[Any, Any]], Hashable]) -> Dict[Hashable, int]:
+    """Map each key to the position of the first record that has it"""
+    positions = {}
+    for i, record in enumerate(records):
+        positions.setdefault(key(record), i)
+    return positions
+
+def _locked(method):
+    """Run a DataManager mutation while holding the data write lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._write_lock():
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class DataManager:
     """Manages data persistence using JSON files"""
@@ -13,173 +65,533 @@ class DataManager:
         self.shifts_file = os.path.join(self.data_dir, 'shifts.json')
         self.teams_file = os.path.join(self.data_dir, 'teams.json')
         self.tasks_file = os.path.join(self.data_dir, 'tasks.json')
+        self.data_files = [
+            self.employees_file,
+            self.ambulances_file,
+            self.shifts_file,
+            self.teams_file,
+            self.tasks_file
+        ]
+        
+        # Per-file record clean-up applied once when a file is parsed
+        self._normalizers: Dict[str, Callable[[Dict[Any, Any]], None]] = {
+            self.shifts_file: self._normalize_shift,
+            self.teams_file: self._normalize_team
+        }
+        
+        # Files whose records are addressed by a stable integer 'id'
+        self._id_files = {self.shifts_file, self.teams_file, self.tasks_file}
+        # Next free id per file name; only ever grows, so deleted ids are never handed out again
+        self.next_ids_file = os.path.join(self.data_dir, 'next_ids.json')
+        
+        # Parsed file contents keyed by path: ((mtime_ns, size, inode), data, derived indexes)
+        self._cache: Dict[str, Tuple[Tuple[int, int, int], List[Dict[Any, Any]], Dict[str, Any]]] = {}
+        
+        # Serializes read-modify-write cycles across threads (RLock) and worker processes (flock)
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_fd: Optional[int] = None
+        self._lock_file = os.path.join(self.data_dir, '.lock')
+        
+        # Pending writes while inside batch(): file path -> records to save
+        self._batch_depth = 0
+        self._pending: Dict[str, List[Dict[Any, Any]]] = {}
         
         # Create data directory if it doesn't exist
-        if not os.path.exists(self.data_dir):
-            os.makedirs(self.data_dir)
+        os.makedirs(self.data_dir, exist_ok=True)
         
         # Initialize files if they don't exist
         self._initialize_files()
     
     def _initialize_files(self):
         """Initialize JSON files with empty data if they don't exist"""
-        files = [
-            (self.employees_file, []),
-            (self.ambulances_file, []),
-            (self.shifts_file, []),
-            (self.teams_file, []),
-            (self.tasks_file, [])
-        ]
+        with os.scandir(self.data_dir) as entries:
+            existing = {entry.name for entry in entries}
+        
+        defaults = dict.fromkeys(self.data_files, [])
+        defaults[self.next_ids_file] = {}
         
-        for file_path, default_data in files:
-            if not os.path.exists(file_path):
+        for file_path, default_data in defaults.items():
+            if os.path.basename(file_path) not in existing:
                 try:
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        json.dump(default_data, f, ensure_ascii=False, indent=2)
+                    with open(file_path, 'wb') as f:
+                        f.write(_dumps(default_data))
                 except Exception as e:
                     logging.error(f"Error initializing {file_path}: {e}")
     
     def _load_json(self, file_path: str) -> List[Dict[Any, Any]]:
-        """Load data from JSON file"""
+        """Load data from JSON file, reusing the cached copy while the file is unchanged"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+            st = os.stat(file_path)
+            version = self._file_version(st)
+            cached = self._cache.get(file_path)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            
+            with open(file_path, 'rb') as f:
+                if orjson is not None and st.st_size >= MMAP_THRESHOLD:
+                    # Parse straight from the page cache instead of copying the file into a bytes object
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                        if view[:2] == GZIP_MAGIC:
+                            data = _loads(gzip.decompress(view))
+                        else:
+                            data = orjson.loads(view)
+                else:
+                    raw = f.read()
+                    if raw[:2] == GZIP_MAGIC:
+                        raw = gzip.decompress(raw)
+                    data = _loads(raw)
+            self._cache_data(file_path, version, data)
+            return data
+        except (FileNotFoundError, json.JSONDecodeError, gzip.BadGzipFile, EOFError) as e:
             logging.error(f"Error loading {file_path}: {e}")
             return []
     
     def _save_json(self, file_path: str, data: List[Dict[Any, Any]]):
-        """Save data to JSON file"""
+        """Save data to JSON file atomically and keep it as the cached copy"""
+        if self._batch_depth:
+            # Serve the new records from the cache until batch() writes them out
+            version = self._file_version(os.stat(file_path))
+            self._cache_data(file_path, version, data)
+            self._pending[file_path] = data
+            return
+        
+        # Mutations change the cached list in place, so drop it until the write succeeds;
+        # if it fails the next read reloads what is actually on disk
+        self._cache.pop(file_path, None)
+        raw = _dumps(data)
+        if COMPRESS_DATA:
+            raw = gzip.compress(raw, compresslevel=1, mtime=0)
+        version = self._write_file(file_path, raw)
+        self._cache_data(file_path, version, data)
+    
+    def _write_file(self, file_path: str, raw: bytes) -> Tuple[int, int, int]:
+        """Replace a file's contents atomically and durably, returning its new version"""
+        tmp_path = f"{file_path}.{os.getpid()}-{threading.get_ident()}.tmp"
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with open(tmp_path, 'wb') as f:
+                f.write(raw)
+                f.flush()
+                os.fsync(f.fileno())
+                version = self._file_version(os.fstat(f.fileno()))
+            os.replace(tmp_path, file_path)
         except Exception as e:
             logging.error(f"Error saving {file_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
             raise
+        return version
+    
+    @staticmethod
+    def _file_version(st: os.stat_result) -> Tuple[int, int, int]:
+        """Identify a file's contents by modification time, size and inode"""
+        # Saves replace the file, so the inode changes even for a same-size write within one timestamp tick
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    
+    def _cache_data(self, file_path: str, version: Tuple[int, int, int], data: List[Dict[Any, Any]]):
+        """Normalize freshly loaded or saved records and cache them"""
+        normalize = self._normalizers.get(file_path)
+        if normalize is not None:
+            for record in data:
+                normalize(record)
+        if file_path in self._id_files:
+            self._assign_ids(file_path, data)
+        self._cache[file_path] = (version, data, {})
+    
+    def _load_next_ids(self) -> Dict[str, int]:
+        """Read the persisted next free id of each file, keyed by file name"""
+        try:
+            with open(self.next_ids_file, 'rb') as f:
+                next_ids = _loads(f.read())
+            if isinstance(next_ids, dict):
+                return next_ids
+            error = f"expected an object, got {type(next_ids).__name__}"
+        except (OSError, ValueError) as e:
+            error = e
+        logging.error(f"Error loading {self.next_ids_file}, new ids continue from each file's highest id: {error}")
+        return {}
+    
+    def _save_next_ids(self, next_ids: Dict[str, int]):
+        """Save the next free id of each file (straight away, even inside batch())"""
+        self._write_file(self.next_ids_file, _dumps(next_ids))
+    
+    @staticmethod
+    def _next_id(file_path: str, records: List[Dict[Any, Any]], next_ids: Dict[str, int]) -> int:
+        """Get the next id never used in a file"""
+        ids = (record['id'] for record in records if 'id' in record)
+        return max(next_ids.get(os.path.basename(file_path), 0), max(ids, default=-1) + 1)
+    
+    def _keep_next_id(self, file_path: str, records: List[Dict[Any, Any]]):
+        """Persist a file's next free id before its records change, so ids given out on load are never reused"""
+        next_ids = self._load_next_ids()
+        next_id = self._next_id(file_path, records, next_ids)
+        if next_ids.get(os.path.basename(file_path)) != next_id:
+            self._save_next_ids({**next_ids, os.path.basename(file_path): next_id})
+    
+    def _assign_ids(self, file_path: str, records: List[Dict[Any, Any]]):
+        """Give records without an id unused ones (files from before ids get their positions)"""
+        missing = [record for record in records if 'id' not in record]
+        if missing:
+            next_id = self._next_id(file_path, records, self._load_next_ids())
+            for record in missing:
+                record['id'] = next_id
+                next_id += 1
+    
+    def _id_at(self, file_path: str, position: int) -> Optional[int]:
+        """Get the id of the record at a list position, if there is one"""
+        records = self._load_json(file_path)
+        if 0 <= position < len(records):
+            return records[position]['id']
+        return None
+    
+    def _id_positions(self, file_path: str) -> Tuple[List[Dict[Any, Any]], Dict[int, int]]:
+        """Get a file's cached records, to change in place, with each id's position in them"""
+        return self._with_index(file_path, 'position_by_id',
+                                lambda records: _first_positions(records, lambda r: r['id']))
+    
+    def _add_record(self, file_path: str, record: Dict[Any, Any]):
+        """Append a record under the next free id"""
+        records = self._load_json(file_path)
+        next_ids = self._load_next_ids()
+        next_id = self._next_id(file_path, records, next_ids)
+        # Record the id as used first: if saving the records then fails it is only skipped
+        self._save_next_ids({**next_ids, os.path.basename(file_path): next_id + 1})
+        records.append({**record, 'id': next_id})
+        self._save_json(file_path, records)
+    
+    def _update_record(self, file_path: str, record_id: int, record: Dict[Any, Any]) -> bool:
+        """Replace the record with the given id, keeping the id; False if there is none"""
+        records, positions = self._id_positions(file_path)
+        i = positions.get(record_id)
+        if i is None:
+            return False
+        self._keep_next_id(file_path, records)
+        records[i] = {**record, 'id': record_id}
+        self._save_json(file_path, records)
+        return True
+    
+    def _delete_record(self, file_path: str, record_id: int) -> bool:
+        """Remove the record with the given id; False if there is none"""
+        records, positions = self._id_positions(file_path)
+        i = positions.get(record_id)
+        if i is None:
+            return False
+        self._keep_next_id(file_path, records)
+        del records[i]
+        self._save_json(file_path, records)
+        return True
+    
+    @contextmanager
+    def _write_lock(self):
+        """Hold the data write lock (reentrant) for the duration of the block"""
+        with self._lock:
+            if not self._lock_depth and fcntl is not None:
+                self._lock_fd = os.open(self._lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if not self._lock_depth and self._lock_fd is not None:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+                    os.close(self._lock_fd)
+                    self._lock_fd = None
+    
+    @contextmanager
+    def batch(self):
+        """Group several changes so each data file is written once, when the outermost batch exits"""
+        with self._write_lock():
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    # Drop the unsaved changes; the next read reloads from disk
+                    for file_path in self._pending:
+                        self._cache.pop(file_path, None)
+                    self._pending.clear()
+                raise
+            
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                pending, self._pending = self._pending, {}
+                try:
+                    for file_path in list(pending):
+                        self._save_json(file_path, pending.pop(file_path))
+                except BaseException:
+                    # Files after the failed one were never written; drop their unsaved records too
+                    for file_path in pending:
+                        self._cache.pop(file_path, None)
+                    raise
+    
+    def _with_index(self, file_path: str, name: str,
+                    build: Callable[[List[Dict[Any, Any]]], Any]) -> Tuple[List[Dict[Any, Any]], Any]:
+        """Get a data file's records together with a lookup structure derived from them"""
+        data = self._load_json(file_path)
+        cached = self._cache.get(file_path)
+        if cached is None or cached[1] is not data:
+            return data, build(data)
+        derived = cached[2]
+        if name not in derived:
+            derived[name] = build(data)
+        return data, derived[name]
+    
+    def _index(self, file_path: str, name: str, build: Callable[[List[Dict[Any, Any]]], Any]) -> Any:
+        """Get a lookup structure derived from a data file, rebuilt only when the file changes"""
+        return self._with_index(file_path, name, build)[1]
+    
+    def debug_dump(self, file_path: str) -> str:
+        """Get a data file's contents as indented JSON for inspection"""
+        return _dumps(self._load_json(file_path), indent=True).decode('utf-8')
+    
+    def prewarm(self):
+        """Load every data file into the cache ahead of the first request"""
+        for file_path in self.data_files:
+            self._load_json(file_path)
+    
+    def last_modified(self) -> int:
+        """Get the most recent modification time (ns) across all data files"""
+        return max(os.stat(file_path).st_mtime_ns for file_path in self.data_files)
+    
+    def snapshot(self) -> Dict[str, List[Dict[Any, Any]]]:
+        """Get all collections at once"""
+        return {
+            'employees': self.get_employees(),
+            'ambulances': self.get_ambulances(),
+            'shifts': self.get_shifts(),
+            'teams': self.get_teams(),
+            'tasks': self.get_tasks()
+        }
     
     # Employee management
     def get_employees(self) -> List[Dict[str, str]]:
         """Get all employees"""
-        return self._load_json(self.employees_file)
+        return list(self._load_json(self.employees_file))
     
+    def get_employees_by_code(self) -> Dict[str, Dict[str, str]]:
+        """Get employees keyed by code (shared, do not modify)"""
+        return self._index(self.employees_file, 'by_code',
+                           lambda employees: {emp['code']: emp for emp in employees})
+    
+    def contains_employee(self, code: str) -> bool:
+        """Check whether an employee code is in use"""
+        return code in self.get_employees_by_code()
+    
+    def count_employees(self) -> int:
+        """Get the number of employees without copying the list"""
+        return len(self._load_json(self.employees_file))
+    
+    @_locked
     def add_employee(self, employee: Dict[str, str]):
         """Add new employee"""
-        employees = self.get_employees()
+        employees = self._load_json(self.employees_file)
         employees.append(employee)
         self._save_json(self.employees_file, employees)
     
+    def _employee_positions(self) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+        """Get the cached employees, to change in place, with each code's position in it"""
+        employees, positions = self._with_index(self.employees_file, 'position_by_code',
+                                                lambda employees: _first_positions(employees, lambda e: e['code']))
+        return employees, positions
+    
+    @_locked
     def update_employee(self, code: str, employee: Dict[str, str]):
         """Update existing employee"""
-        employees = self.get_employees()
-        for i, emp in enumerate(employees):
-            if emp['code'] == code:
-                employees[i] = employee
-                break
-        self._save_json(self.employees_file, employees)
+        employees, positions = self._employee_positions()
+        i = positions.get(code)
+        if i is not None:
+            employees[i] = employee
+            self._save_json(self.employees_file, employees)
     
+    @_locked
     def delete_employee(self, code: str):
         """Delete employee"""
-        employees = self.get_employees()
-        employees = [emp for emp in employees if emp['code'] != code]
-        self._save_json(self.employees_file, employees)
+        employees, positions = self._employee_positions()
+        i = positions.get(code)
+        if i is not None:
+            del employees[i]
+            self._save_json(self.employees_file, employees)
     
     # Ambulance management
     def get_ambulances(self) -> List[Dict[str, str]]:
         """Get all ambulances"""
-        return self._load_json(self.ambulances_file)
+        return list(self._load_json(self.ambulances_file))
+    
+    def get_ambulances_by_plate(self) -> Dict[str, Dict[str, str]]:
+        """Get ambulances keyed by plate number (shared, do not modify)"""
+        return self._index(self.ambulances_file, 'by_plate',
+                           lambda ambulances: {amb['plate']: amb for amb in ambulances})
+    
+    def contains_ambulance(self, plate: str) -> bool:
+        """Check whether a plate number is registered"""
+        return plate in self.get_ambulances_by_plate()
     
+    def count_ambulances(self) -> int:
+        """Get the number of ambulances without copying the list"""
+        return len(self._load_json(self.ambulances_file))
+    
+    @_locked
     def add_ambulance(self, ambulance: Dict[str, str]):
         """Add new ambulance"""
-        ambulances = self.get_ambulances()
+        ambulances = self._load_json(self.ambulances_file)
         ambulances.append(ambulance)
         self._save_json(self.ambulances_file, ambulances)
     
+    def _ambulance_positions(self) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+        """Get the cached ambulances, to change in place, with each plate's position in it"""
+        ambulances, positions = self._with_index(self.ambulances_file, 'position_by_plate',
+                                                 lambda ambulances: _first_positions(ambulances, lambda a: a['plate']))
+        return ambulances, positions
+    
+    @_locked
     def update_ambulance(self, plate: str, ambulance: Dict[str, str]):
         """Update existing ambulance"""
-        ambulances = self.get_ambulances()
-        for i, amb in enumerate(ambulances):
-            if amb['plate'] == plate:
-                ambulances[i] = ambulance
-                break
-        self._save_json(self.ambulances_file, ambulances)
+        ambulances, positions = self._ambulance_positions()
+        i = positions.get(plate)
+        if i is not None:
+            ambulances[i] = ambulance
+            self._save_json(self.ambulances_file, ambulances)
     
+    @_locked
     def delete_ambulance(self, plate: str):
         """Delete ambulance"""
-        ambulances = self.get_ambulances()
-        ambulances = [amb for amb in ambulances if amb['plate'] != plate]
-        self._save_json(self.ambulances_file, ambulances)
+        ambulances, positions = self._ambulance_positions()
+        i = positions.get(plate)
+        if i is not None:
+            del ambulances[i]
+            self._save_json(self.ambulances_file, ambulances)
     
     # Shift management
     def get_shifts(self) -> List[Dict[str, str]]:
         """Get all shifts"""
-        return self._load_json(self.shifts_file)
+        return list(self._load_json(self.shifts_file))
     
+    @staticmethod
+    def _normalize_shift(shift: Dict[str, str]):
+        """Share one string object per distinct date/code/sector across all shifts"""
+        for key in ('date', 'period', 'employee_code', 'sector'):
+            value = shift.get(key)
+            if isinstance(value, str):
+                shift[key] = sys.intern(value)
+    
+    def get_shifts_for_month(self, month: str) -> List[Dict[str, str]]:
+        """Get all shifts in a month (YYYY-MM)"""
+        by_month = self._index(self.shifts_file, 'by_month', self._group_by_month)
+        return list(by_month.get(month, []))
+    
+    @staticmethod
+    def _group_by_month(shifts: List[Dict[str, str]]) -> Dict[str, List[Dict[str, str]]]:
+        """Group shifts by the month (YYYY-MM) of their date"""
+        by_month: Dict[str, List[Dict[str, str]]] = {}
+        for shift in shifts:
+            by_month.setdefault(shift['date'][:7], []).append(shift)
+        return by_month
+    
+    def find_shift(self, employee_code: str, date: str) -> Optional[int]:
+        """Get the id of an employee's shift on a date, if any"""
+        shifts, positions = self._with_index(self.shifts_file, 'by_employee_date',
+                                             lambda shifts: _first_positions(shifts, lambda s: (s['employee_code'], s['date'])))
+        i = positions.get((employee_code, date))
+        return None if i is None else shifts[i]['id']
+    
+    def shift_id_at(self, position: int) -> Optional[int]:
+        """Get the id of the shift at a position in get_shifts(), if any"""
+        return self._id_at(self.shifts_file, position)
+    
+    @_locked
     def add_shift(self, shift: Dict[str, str]):
         """Add new shift"""
-        shifts = self.get_shifts()
-        shifts.append(shift)
-        self._save_json(self.shifts_file, shifts)
-    
-    def update_shift(self, shift_id: int, shift: Dict[str, str]):
-        """Update existing shift"""
-        shifts = self.get_shifts()
-        if 0 <= shift_id < len(shifts):
-            shifts[shift_id] = shift
-            self._save_json(self.shifts_file, shifts)
-    
-    def delete_shift(self, shift_id: int):
-        """Delete shift"""
-        shifts = self.get_shifts()
-        if 0 <= shift_id < len(shifts):
-            shifts.pop(shift_id)
-            self._save_json(self.shifts_file, shifts)
+        self._add_record(self.shifts_file, shift)
+    
+    @_locked
+    def update_shift(self, shift_id: int, shift: Dict[str, str]) -> bool:
+        """Update existing shift (False if there is none)"""
+        return self._update_record(self.shifts_file, shift_id, shift)
+    
+    @_locked
+    def delete_shift(self, shift_id: int) -> bool:
+        """Delete shift (False if there is none)"""
+        return self._delete_record(self.shifts_file, shift_id)
     
     # Teams management
     def get_teams(self) -> List[Dict[str, str]]:
         """Get all team preparations"""
-        return self._load_json(self.teams_file)
+        return list(self._load_json(self.teams_file))
+    
+    def find_team(self, date: str) -> Optional[int]:
+        """Get the id of the team preparation for a date, if any"""
+        teams, positions = self._with_index(self.teams_file, 'by_date',
+                                            lambda teams: _first_positions(teams, lambda t: t['date']))
+        i = positions.get(date)
+        return None if i is None else teams[i]['id']
+    
+    def team_id_at(self, position: int) -> Optional[int]:
+        """Get the id of the team preparation at a position in get_teams(), if any"""
+        return self._id_at(self.teams_file, position)
     
+    @staticmethod
+    def _normalize_team(team: Dict[str, Any]):
+        """Store team counts as ints and make sure every field is present"""
+        for key in ('morning_teams', 'evening_teams', 'full_teams'):
+            try:
+                team[key] = int(team.get(key) or 0)
+            except (TypeError, ValueError):
+                team[key] = 0
+        team.setdefault('notes', '')
+    
+    @_locked
     def add_team(self, team: Dict[str, str]):
         """Add new team preparation"""
-        teams = self.get_teams()
-        teams.append(team)
-        self._save_json(self.teams_file, teams)
-    
-    def update_team(self, team_id: int, team: Dict[str, str]):
-        """Update existing team preparation"""
-        teams = self.get_teams()
-        if 0 <= team_id < len(teams):
-            teams[team_id] = team
-            self._save_json(self.teams_file, teams)
-    
-    def delete_team(self, team_id: int):
-        """Delete team preparation"""
-        teams = self.get_teams()
-        if 0 <= team_id < len(teams):
-            teams.pop(team_id)
-            self._save_json(self.teams_file, teams)
+        self._add_record(self.teams_file, team)
+    
+    @_locked
+    def update_team(self, team_id: int, team: Dict[str, str]) -> bool:
+        """Update existing team preparation (False if there is none)"""
+        return self._update_record(self.teams_file, team_id, team)
+    
+    @_locked
+    def delete_team(self, team_id: int) -> bool:
+        """Delete team preparation (False if there is none)"""
+        return self._delete_record(self.teams_file, team_id)
     
     # Tasks management
     def get_tasks(self) -> List[Dict[str, str]]:
         """Get all logistics support tasks"""
-        return self._load_json(self.tasks_file)
+        return list(self._load_json(self.tasks_file))
+    
+    def search_tasks(self, employee: str = '', supervisor: str = '') -> List[Dict[str, str]]:
+        """Get tasks whose employee and supervisor names contain the given text (case-insensitive)"""
+        tasks, names = self._with_index(self.tasks_file, 'lowercase_names',
+                                        lambda tasks: [(t.get('employee_name', '').lower(),
+                                                        t.get('supervisor_name', '').lower()) for t in tasks])
+        employee = employee.lower()
+        supervisor = supervisor.lower()
+        return [task for task, (employee_name, supervisor_name) in zip(tasks, names)
+                if employee in employee_name and supervisor in supervisor_name]
     
+    def task_id_at(self, position: int) -> Optional[int]:
+        """Get the id of the task at a position in get_tasks(), if any"""
+        return self._id_at(self.tasks_file, position)
+    
+    def get_task(self, task_id: int) -> Optional[Dict[str, str]]:
+        """Get a task by id, if it exists"""
+        tasks, positions = self._id_positions(self.tasks_file)
+        i = positions.get(task_id)
+        return None if i is None else dict(tasks[i])
+    
+    @_locked
     def add_task(self, task: Dict[str, str]):
         """Add new logistics support task"""
-        tasks = self.get_tasks()
-        tasks.append(task)
-        self._save_json(self.tasks_file, tasks)
-    
-    def update_task(self, task_id: int, task: Dict[str, str]):
-        """Update existing task"""
-        tasks = self.get_tasks()
-        if 0 <= task_id < len(tasks):
-            tasks[task_id] = task
-            self._save_json(self.tasks_file, tasks)
-    
-    def delete_task(self, task_id: int):
-        """Delete task"""
-        tasks = self.get_tasks()
-        if 0 <= task_id < len(tasks):
-            tasks.pop(task_id)
-            self._save_json(self.tasks_file, tasks)
+        self._add_record(self.tasks_file, task)
+    
+    @_locked
+    def update_task(self, task_id: int, task: Dict[str, str]) -> bool:
+        """Update existing task (False if there is none)"""
+        return self._update_record(self.tasks_file, task_id, task)
+    
+    @_locked
+    def delete_task(self, task_id: int) -> bool:
+        """Delete task (False if there is none)"""
+        return self._delete_record(self.tasks_file, task_id)
@@ -0,0 +1,46 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager
+
+
+class RecordIdTests(unittest.TestCase):
+    """Stable ids of shifts, teams and tasks"""
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+        os.makedirs('data')
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def test_deleted_id_from_file_without_ids_is_not_reused(self):
+        shifts = [{'date': f'2026-01-0{i + 1}', 'period': 'D', 'employee_code': 'E1', 'sector': 's'}
+                  for i in range(3)]
+        with open(os.path.join('data', 'shifts.json'), 'w') as f:
+            json.dump(shifts, f)
+
+        data_manager = DataManager()
+        self.assertEqual([shift['id'] for shift in data_manager.get_shifts()], [0, 1, 2])
+
+        data_manager.delete_shift(2)
+        data_manager.add_shift({'date': '2026-01-04', 'period': 'D', 'employee_code': 'E1', 'sector': 's'})
+        self.assertEqual([shift['id'] for shift in data_manager.get_shifts()], [0, 1, 3])
+
+        # A fresh process sees the same counter
+        data_manager = DataManager()
+        data_manager.delete_shift(3)
+        data_manager.add_shift({'date': '2026-01-05', 'period': 'D', 'employee_code': 'E1', 'sector': 's'})
+        self.assertEqual([shift['id'] for shift in data_manager.get_shifts()], [0, 1, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()